@@ -1,8 +1,11 @@
 import os
+import io
 import csv
 import math
+import bisect
 import argparse
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
 
 import matplotlib
 matplotlib.use("Agg")
@@ -14,13 +17,82 @@ def ensure_dir(p):
         os.makedirs(p, exist_ok=True)
 
 
-def read_rows(path, fmt):
-    rows = []
+def fmt_delim(fmt):
     if fmt == "tsv":
-        delim = "\t"
-    else:
-        delim = ","
+        return "\t"
+    return ","
+
+
+def read_header(path, delim):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f, delimiter=delim))
+
+
+def read_row_index(path):
+    # Sparse sidecar written by structural_primality.py --index_every K:
+    # a metric/value block, then (n, byte offset) pairs in ascending n.
+    meta = {}
+    entries = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        in_entries = False
+        for rec in csv.reader(f, delimiter="\t"):
+            if not rec or rec[0] == "metric":
+                continue
+            if rec[0] == "n":
+                in_entries = True
+                continue
+            if in_entries:
+                entries.append((int(rec[0]), int(rec[1])))
+            else:
+                meta[rec[0]] = rec[1]
+    return meta, entries
+
+
+def row_index_matches(path, fmt, meta):
+    # A .idx left behind by an earlier run points at the wrong bytes.
+    return meta.get("fmt") == fmt and int(meta.get("total_bytes", -1)) == os.path.getsize(path)
+
+
+def row_dict(fields, rec):
+    # Same shape csv.DictReader gives: surplus values under None, missing ones as None.
+    r = dict(zip(fields, rec))
+    if len(rec) > len(fields):
+        r[None] = list(rec[len(fields):])
+    elif len(rec) < len(fields):
+        for k in fields[len(rec):]:
+            r[k] = None
+    return r
+
+
+def parse_byte_range(task):
+    # Rows go back as plain tuples; the parent rebuilds the dicts.
+    path, delim, start, end = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return [tuple(rec) for rec in csv.reader(io.StringIO(data.decode("utf-8"), newline=""), delimiter=delim)]
+
+
+def read_rows(path, fmt, index_path="", workers=1):
+    delim = fmt_delim(fmt)
+
+    if index_path and workers > 1:
+        meta, entries = read_row_index(index_path)
+        if not row_index_matches(path, fmt, meta):
+            raise ValueError(f"row index {index_path} does not match {path}")
+        total = int(meta["total_bytes"])
+        if entries:
+            fields = read_header(path, delim)
+            step = max(1, len(entries) // (workers * 4))
+            cuts = [entries[i][1] for i in range(0, len(entries), step)] + [total]
+            tasks = [(path, delim, cuts[i], cuts[i + 1]) for i in range(len(cuts) - 1)]
+            rows = []
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                for part in ex.map(parse_byte_range, tasks):
+                    rows.extend(row_dict(fields, rec) for rec in part)
+            return rows
 
+    rows = []
     with open(path, "r", encoding="utf-8") as f:
         reader = csv.DictReader(f, delimiter=delim)
         for r in reader:
@@ -28,6 +100,40 @@ def read_rows(path, fmt):
     return rows
 
 
+def read_rows_range(path, fmt, n_lo, n_hi, index_path=""):
+    delim = fmt_delim(fmt)
+    fields = read_header(path, delim)
+
+    start = None
+    if index_path:
+        meta, entries = read_row_index(index_path)
+        if not row_index_matches(path, fmt, meta):
+            raise ValueError(f"row index {index_path} does not match {path}")
+        i = bisect.bisect_right([n for n, _ in entries], n_lo) - 1
+        if i >= 0:
+            start = entries[i][1]
+        elif entries:
+            start = entries[0][1]
+
+    rows = []
+    with open(path, "rb") as raw:
+        if start is not None:
+            raw.seek(start)
+        f = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        if start is None:
+            reader = csv.DictReader(f, delimiter=delim)
+        else:
+            reader = csv.DictReader(f, fieldnames=fields, delimiter=delim)
+        for r in reader:
+            n = to_int(r.get("n"))
+            if n is None or n < n_lo:
+                continue
+            if n > n_hi:
+                break
+            rows.append(r)
+    return rows
+
+
 def write_index(out_dir, items):
     p = os.path.join(out_dir, "INDEX.txt")
     with open(p, "w", encoding="utf-8", newline="\n") as f:
@@ -160,18 +266,30 @@ def plot_composite_closure_d_topk(rows, out_png, k=40):
     return items
 
 
-def plot_prime_ratio_by_bucket(rows, out_png, bucket):
+def plot_prime_ratio_by_bucket(rows, out_png, bucket, prefix_index=None):
     # Compute prime ratio per bucket of n (bucket based on n-1 so bucket=1000 groups 1..1000, 1001..2000, ...)
     buckets = defaultdict(lambda: [0, 0])  # bucket_start -> [total, primes]
-    for r in rows:
-        n = to_int(r.get("n"))
-        if n is None:
-            continue
-        eff_n = n - 1 if n > 0 else 0
-        b = (eff_n // bucket) * bucket
-        buckets[b][0] += 1
-        if str(r.get("status", "")).strip() == "STRUCTURAL_PRIME":
-            buckets[b][1] += 1
+    if prefix_index is not None:
+        # Every n in 2..max_n is covered, so counts come from two index lookups per bucket.
+        from structural_primality import prefix_range_primes
+        max_n = prefix_index["max_n"]
+        for b in range(0, max_n, bucket):
+            lo = max(2, b + 1)
+            hi = min(max_n, b + bucket)
+            if lo > hi:
+                continue
+            buckets[b][0] = hi - lo + 1
+            buckets[b][1] = prefix_range_primes(prefix_index, lo, hi)
+    else:
+        for r in rows:
+            n = to_int(r.get("n"))
+            if n is None:
+                continue
+            eff_n = n - 1 if n > 0 else 0
+            b = (eff_n // bucket) * bucket
+            buckets[b][0] += 1
+            if str(r.get("status", "")).strip() == "STRUCTURAL_PRIME":
+                buckets[b][1] += 1
 
     if not buckets:
         plt.figure()
@@ -264,10 +382,39 @@ def main():
     ap.add_argument("--out_dir", required=True)
     ap.add_argument("--bucket", type=int, default=1000)
     ap.add_argument("--topk", type=int, default=40)
+    ap.add_argument("--index", default="", help="sparse offset index (default: <rows>.idx if present)")
+    ap.add_argument("--workers", type=int, default=1, help="parse an indexed rows file in this many processes")
+    ap.add_argument("--n_range", default="", help="only load rows with a <= n <= b, given as a:b")
+    ap.add_argument("--prefix_index", default="", help="prefix-count index from structural_primality.py --prefix_index_out")
     args = ap.parse_args()
 
+    n_range = None
+    if args.n_range:
+        parts = args.n_range.split(":")
+        try:
+            if len(parts) != 2:
+                raise ValueError
+            n_range = (int(parts[0]), int(parts[1]))
+        except ValueError:
+            ap.error(f"--n_range {args.n_range!r} is not of the form a:b")
+        if n_range[0] > n_range[1]:
+            ap.error(f"--n_range {args.n_range!r} has a > b")
+
+    row_index = args.index
+    if row_index:
+        if not row_index_matches(args.rows, args.fmt, read_row_index(row_index)[0]):
+            ap.error(f"--index {row_index} does not match --rows {args.rows} (stale index or other --fmt)")
+    elif os.path.isfile(args.rows + ".idx"):
+        row_index = args.rows + ".idx"
+        if not row_index_matches(args.rows, args.fmt, read_row_index(row_index)[0]):
+            row_index = ""
+
     print("STRUCTURAL PRIMALITY PLOT RUN")
-    rows = read_rows(args.rows, args.fmt)
+    print(f"row_index = {row_index or '(none)'}")
+    if n_range:
+        rows = read_rows_range(args.rows, args.fmt, n_range[0], n_range[1], row_index)
+    else:
+        rows = read_rows(args.rows, args.fmt, row_index, max(1, args.workers))
     print(f"rows_loaded = {len(rows)}")
 
     ensure_dir(args.out_dir)
@@ -313,7 +460,11 @@ def main():
     report_lines.append("")
 
     p4 = os.path.join(args.out_dir, "04_prime_ratio_by_bucket.png")
-    points = plot_prime_ratio_by_bucket(rows, p4, bucket=args.bucket)
+    prefix_index = None
+    if args.prefix_index:
+        from structural_primality import load_prefix_index
+        prefix_index = load_prefix_index(args.prefix_index)
+    points = plot_prime_ratio_by_bucket(rows, p4, bucket=args.bucket, prefix_index=prefix_index)
     print(f"plot = {p4}")
     index_items.append(os.path.basename(p4))
     report_lines.append(f"04 Prime ratio by bucket (bucket={args.bucket}):")
@@ -1,7 +1,14 @@
 import argparse
+import bisect
 import csv
+import hashlib
 import math
+import os
+import queue
+import random
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 def band_from_a(a: float) -> str:
@@ -19,23 +26,36 @@ def band_from_a(a: float) -> str:
     return "F"
 
 
-def clamp01(x: float) -> float:
-    if x < 0.0:
-        return 0.0
-    if x > 1.0:
-        return 1.0
-    return x
+def band_from_q(num: int, den: int) -> str:
+    # Exact twin of band_from_a for a = num/den (den > 0).
+    x = abs(num) * 10
+    if x >= 9 * den:
+        return "A"
+    if x >= 7 * den:
+        return "B"
+    if x >= 5 * den:
+        return "C"
+    if x >= 3 * den:
+        return "D"
+    if x >= den:
+        return "E"
+    return "F"
 
 
-def compute_hardness(closest_a, S_energy):
-    if closest_a in ("", None) or S_energy in ("", None):
-        return ""
-    try:
-        a_term = clamp01(abs(float(closest_a)))
-        s_term = clamp01(1.0 / (1.0 + abs(float(S_energy))))
-        return 0.7 * a_term + 0.3 * s_term
-    except Exception:
+def compute_hardness_q(a_q, e_q, invert: bool = False):
+    # 0.7 * min(|a|, 1) + 0.3 / (1 + |S_energy|), evaluated on exact
+    # (num, den) pairs and rounded to float once at the end.
+    if a_q in ("", None) or e_q in ("", None):
         return ""
+    a_num, a_den = a_q
+    e_num, e_den = e_q
+    a_num = min(abs(a_num), a_den)
+    s_den = e_den + abs(e_num)
+    num = 7 * a_num * s_den + 3 * e_den * a_den
+    den = 10 * a_den * s_den
+    if invert:
+        num = den - num
+    return num / den
 
 
 def sieve_spf(nmax: int):
@@ -65,71 +85,212 @@ def generate_sig_primes(sig_div_cap: int):
     return primes
 
 
-def signature_for_n(n: int, sig_primes, limit_d: int):
-    best = None
-    g_list = []
+SIG_TABLE_MAX_D = 1024
+SIG_GROUP_BITS = 60
+
 
+def signature_kernel(sig_primes):
+    # Common denominator L = prod(sig_primes): g_i = gap_i / d_i = gap_i * (L / d_i) / L,
+    # so sums of g and g^2 stay exact integer numerators over k*L and k*L^2.
+    # Primes are packed into groups with product P below 2^SIG_GROUP_BITS;
+    # inside a group the numerators gap * (P / d) stay machine-sized and only
+    # the group total is lifted to L (times L / P). For small d the in-group
+    # numerators for every possible gap are tabulated.
+    L = 1
     for d in sig_primes:
-        if d > limit_d:
-            break
+        L *= d
 
-        r = n % d
+    groups = []
+    for d in sig_primes:
+        if groups and groups[-1][0] * d < (1 << SIG_GROUP_BITS):
+            groups[-1][0] *= d
+            groups[-1][1].append(d)
+        else:
+            groups.append([d, [d]])
 
-        if r == 0:
-            return {
-                "closest_d": d,
-                "closest_r": 0,
-                "closest_gap": 0,
-                "closest_g": 0.0,
-                "closest_a": 1.0,
-                "closest_band": band_from_a(1.0),
-                "S_min": 0.0,
-                "S_avg": 0.0,
-                "S_energy": 0.0,
-            }
+    table = []
+    for P, ds in groups:
+        entries = []
+        for d in ds:
+            w1 = P // d
+            w2 = w1 * w1
+            if d <= SIG_TABLE_MAX_D:
+                t1 = [g * w1 for g in range(d // 2 + 1)]
+                t2 = [g * g * w2 for g in range(d // 2 + 1)]
+            else:
+                t1 = t2 = None
+            entries.append((d, w1, w2, t1, t2))
+        W1 = L // P
+        table.append((W1, W1 * W1, entries))
+    return L, table
 
-        gap = r if r <= (d - r) else (d - r)
-        g = gap / d
-        a = 1.0 - 2.0 * g
 
-        g_list.append(g)
+SIG_CLOSURE = {
+    "closest_d": 0,
+    "closest_r": 0,
+    "closest_gap": 0,
+    "closest_g": 0.0,
+    "closest_a": 1.0,
+    "closest_band": band_from_a(1.0),
+    "S_min": 0.0,
+    "S_avg": 0.0,
+    "S_energy": 0.0,
+    "closest_a_q": (1, 1),
+    "S_energy_q": (0, 1),
+}
 
-        if best is None or g < best[0]:
-            best = (g, d, r, gap, a)
+SIG_EMPTY = {
+    "closest_d": "",
+    "closest_r": "",
+    "closest_gap": "",
+    "closest_g": "",
+    "closest_a": "",
+    "closest_band": "",
+    "S_min": "",
+    "S_avg": "",
+    "S_energy": "",
+    "closest_a_q": "",
+    "S_energy_q": "",
+}
+
+
+def signature_closure(d: int):
+    out = dict(SIG_CLOSURE)
+    out["closest_d"] = d
+    return out
 
-    if best is None:
-        return {
-            "closest_d": "",
-            "closest_r": "",
-            "closest_gap": "",
-            "closest_g": "",
-            "closest_a": "",
-            "closest_band": "",
-            "S_min": "",
-            "S_avg": "",
-            "S_energy": "",
-        }
 
-    S_min = min(g_list) if g_list else ""
-    S_avg = (sum(g_list) / len(g_list)) if g_list else ""
-    S_energy = (sum(x * x for x in g_list) / len(g_list)) if g_list else ""
+def signature_result(L: int, bd: int, br: int, bgap: int, k: int, s_num: int, e_num: int):
+    if bd == 0:
+        return dict(SIG_EMPTY)
 
-    g, d, r, gap, a = best
+    a_num = bd - 2 * bgap
+    e_den = k * L * L
     return {
-        "closest_d": d,
-        "closest_r": r,
-        "closest_gap": gap,
-        "closest_g": g,
-        "closest_a": a,
-        "closest_band": band_from_a(a),
-        "S_min": S_min,
-        "S_avg": S_avg,
-        "S_energy": S_energy,
+        "closest_d": bd,
+        "closest_r": br,
+        "closest_gap": bgap,
+        "closest_g": bgap / bd,
+        "closest_a": a_num / bd,
+        "closest_band": band_from_q(a_num, bd),
+        "S_min": bgap / bd,
+        "S_avg": s_num / (k * L),
+        "S_energy": e_num / e_den,
+        "closest_a_q": (a_num, bd),
+        "S_energy_q": (e_num, e_den),
     }
 
 
+def signature_for_n(n: int, sig_primes, limit_d: int, kernel=None):
+    if kernel is None:
+        kernel = signature_kernel(sig_primes)
+    L, table = kernel
+
+    # bd = 0, bgap = 1 makes the first gap compare as closest
+    bd = 0
+    br = 0
+    bgap = 1
+    k = 0
+    s_num = 0
+    e_num = 0
+
+    for W1, W2, entries in table:
+        sg = 0
+        eg = 0
+        done = False
+        for d, w1, w2, t1, t2 in entries:
+            if d > limit_d:
+                done = True
+                break
+
+            r = n % d
+
+            if r == 0:
+                return signature_closure(d)
+
+            gap = r if r <= (d - r) else (d - r)
+
+            if t1 is not None:
+                sg += t1[gap]
+                eg += t2[gap]
+            else:
+                sg += gap * w1
+                eg += gap * gap * w2
+            k += 1
+
+            if gap * bd < bgap * d:
+                bd, br, bgap = d, r, gap
+
+        s_num += sg * W1
+        e_num += eg * W2
+        if done:
+            break
+
+    return signature_result(L, bd, br, bgap, k, s_num, e_num)
+
+
+def signature_sweep_for_n(n: int, sig_primes, limits, kernel=None):
+    # One walk over the signature primes serves every limit in `limits`
+    # (ascending): residues of the shared prefix are computed once and the
+    # running accumulators are snapshotted as each limit is passed.
+    if kernel is None:
+        kernel = signature_kernel(sig_primes)
+    L, table = kernel
+
+    out = []
+    j = 0
+    bd = 0
+    br = 0
+    bgap = 1
+    k = 0
+    s_num = 0
+    e_num = 0
+
+    for W1, W2, entries in table:
+        sg = 0
+        eg = 0
+        for d, w1, w2, t1, t2 in entries:
+            while j < len(limits) and d > limits[j]:
+                out.append(signature_result(L, bd, br, bgap, k, s_num + sg * W1, e_num + eg * W2))
+                j += 1
+            if j == len(limits):
+                return out
+
+            r = n % d
+
+            if r == 0:
+                closure = signature_closure(d)
+                while j < len(limits):
+                    out.append(closure)
+                    j += 1
+                return out
+
+            gap = r if r <= (d - r) else (d - r)
+
+            if t1 is not None:
+                sg += t1[gap]
+                eg += t2[gap]
+            else:
+                sg += gap * w1
+                eg += gap * gap * w2
+            k += 1
+
+            if gap * bd < bgap * d:
+                bd, br, bgap = d, r, gap
+
+        s_num += sg * W1
+        e_num += eg * W2
+
+    while j < len(limits):
+        out.append(signature_result(L, bd, br, bgap, k, s_num, e_num))
+        j += 1
+    return out
+
+
 def closest_full_for_n(n: int, limit_d: int):
-    best = None
+    bd = 0
+    br = 0
+    bgap = 0
     for d in range(2, limit_d + 1):
         r = n % d
         if r == 0:
@@ -140,13 +301,12 @@ def closest_full_for_n(n: int, limit_d: int):
                 "closest_g": 0.0,
                 "closest_a": 1.0,
                 "closest_band": band_from_a(1.0),
+                "closest_a_q": (1, 1),
             }
         gap = r if r <= (d - r) else (d - r)
-        g = gap / d
-        a = 1.0 - 2.0 * g
-        if best is None or g < best[0]:
-            best = (g, d, r, gap, a)
-    if best is None:
+        if bd == 0 or gap * bd < bgap * d:
+            bd, br, bgap = d, r, gap
+    if bd == 0:
         return {
             "closest_d": "",
             "closest_r": "",
@@ -154,55 +314,316 @@ def closest_full_for_n(n: int, limit_d: int):
             "closest_g": "",
             "closest_a": "",
             "closest_band": "",
+            "closest_a_q": "",
         }
-    g, d, r, gap, a = best
+    a_num = bd - 2 * bgap
     return {
-        "closest_d": d,
-        "closest_r": r,
-        "closest_gap": gap,
-        "closest_g": g,
-        "closest_a": a,
-        "closest_band": band_from_a(a),
+        "closest_d": bd,
+        "closest_r": br,
+        "closest_gap": bgap,
+        "closest_g": bgap / bd,
+        "closest_a": a_num / bd,
+        "closest_band": band_from_q(a_num, bd),
+        "closest_a_q": (a_num, bd),
     }
 
 
-def write_rows(args, sig_div_cap: int):
-    nmax = max(2, args.max_n)
-    fmt = args.fmt.lower().strip()
-    delim = "\t" if fmt == "tsv" else ","
+TRIAL_SCREEN_MAX_P = 997
+TRIAL_BLOCK = 512
 
-    out_fp = None
-    if args.out:
-        out_fp = open(args.out, "w", newline="", encoding="utf-8")
-        fp = out_fp
-    else:
-        fp = sys.stdout
 
-    fields = [
-        "n",
-        "status",
-        "closure_d",
-        "closure_r",
-        "closure_a",
-        "closure_band",
-        "closest_d",
-        "closest_r",
-        "closest_gap",
-        "closest_g",
-        "closest_a",
-        "closest_band",
-        "S_min",
-        "S_avg",
-        "S_energy",
-        "hardness",
-        "notes",
+def product_tree(xs):
+    tree = [list(xs)]
+    while len(tree[-1]) > 1:
+        lv = tree[-1]
+        tree.append([lv[i] * lv[i + 1] if i + 1 < len(lv) else lv[i] for i in range(0, len(lv), 2)])
+    return tree
+
+
+def remainder_tree(q: int, tree):
+    rems = [q % tree[-1][0]]
+    for lv in reversed(tree[:-1]):
+        rems = [rems[i // 2] % x for i, x in enumerate(lv)]
+    return rems
+
+
+def trial_prime_setup(nmax: int):
+    div_primes = [p for p in generate_sig_primes(int(math.isqrt(nmax))) if p != 2]
+    split = 0
+    screen_q = 1
+    while split < len(div_primes) and div_primes[split] <= TRIAL_SCREEN_MAX_P:
+        screen_q *= div_primes[split]
+        split += 1
+    return div_primes, split, screen_q
+
+
+def trial_prime_witnesses(ns, setup):
+    # Smallest odd prime d <= isqrt(n) dividing n, or 0, for each odd n in ns.
+    # A batch GCD of the block against the product of the small screen primes
+    # tells which n have a small factor at all; the others skip straight to
+    # the primes above the screen.
+    div_primes, split, screen_q = setup
+    rems = remainder_tree(screen_q, product_tree(ns))
+    out = {}
+    for n, rq in zip(ns, rems):
+        limit_d = int(math.isqrt(n))
+        w = 0
+        if math.gcd(rq, n) > 1:
+            cand = div_primes[:split]
+        else:
+            cand = div_primes[split:]
+        for d in cand:
+            if d > limit_d:
+                break
+            if n % d == 0:
+                w = d
+                break
+        out[n] = w
+    return out
+
+
+def merkle_root(leaves):
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+    level = [bytes.fromhex(h) for h in leaves]
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [
+            hashlib.sha256(level[i] + level[i + 1]).digest()
+            for i in range(0, len(level), 2)
+        ]
+    return level[0].hex()
+
+
+class RowStream:
+    # Wraps the rows output so every byte handed to csv.writer is counted and,
+    # when a digest is requested, hashed into the chunk owning the current n.
+    # With index_every > 0 the byte offset of the first row at or past every
+    # index_every-th n is kept for the sparse .idx sidecar.
+    def __init__(self, fp, nmax: int, digest_chunk: int = 0, index_every: int = 0):
+        self.fp = fp
+        self.nmax = nmax
+        self.offset = 0
+        self.index_every = index_every
+        self.index = []
+        self.index_bucket = -1
+        self.digest_chunk = digest_chunk
+        self.header_hash = hashlib.sha256()
+        self.header_bytes = 0
+        self.chunks = []
+        self.cur = None
+
+    def write(self, s):
+        b = s.encode("utf-8")
+        self.offset += len(b)
+        if self.digest_chunk > 0:
+            if self.cur is None:
+                self.header_hash.update(b)
+                self.header_bytes += len(b)
+            else:
+                self.cur[3].update(b)
+        return self.fp.write(s)
+
+    def _close_chunk(self):
+        k, n_lo, start, h = self.cur
+        n_hi = min(self.nmax, (k + 1) * self.digest_chunk - 1)
+        self.chunks.append((k, n_lo, n_hi, start, self.offset, h.hexdigest()))
+        self.cur = None
+
+    def _open_chunk(self, k):
+        n_lo = max(2, k * self.digest_chunk)
+        self.cur = (k, n_lo, self.offset, hashlib.sha256())
+
+    def _advance_chunk(self, k: int):
+        if self.cur is None and not self.chunks:
+            self._open_chunk(2 // self.digest_chunk)
+        while self.cur[0] < k:
+            nxt = self.cur[0] + 1
+            self._close_chunk()
+            self._open_chunk(nxt)
+
+    def begin_n(self, n: int):
+        if self.index_every > 0 and n // self.index_every > self.index_bucket:
+            self.index_bucket = n // self.index_every
+            self.index.append((n, self.offset))
+        if self.digest_chunk > 0:
+            self._advance_chunk(n // self.digest_chunk)
+
+    def finish(self):
+        if self.digest_chunk > 0:
+            self._advance_chunk(self.nmax // self.digest_chunk)
+            self._close_chunk()
+
+    def write_digest(self, path: str):
+        leaves = [self.header_hash.hexdigest()] + [c[5] for c in self.chunks]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, delimiter="\t")
+            w.writerow(["metric", "value"])
+            w.writerow(["algorithm", "sha256"])
+            w.writerow(["chunk_n", self.digest_chunk])
+            w.writerow(["max_n", self.nmax])
+            w.writerow(["total_bytes", self.offset])
+            w.writerow(["header_bytes", self.header_bytes])
+            w.writerow(["header_sha256", leaves[0]])
+            w.writerow(["merkle_root", merkle_root(leaves)])
+            w.writerow([])
+            w.writerow(["chunk", "n_lo", "n_hi", "byte_start", "byte_end", "sha256"])
+            for c in self.chunks:
+                w.writerow(list(c))
+
+    def write_index(self, path: str, fmt: str):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, delimiter="\t")
+            w.writerow(["metric", "value"])
+            w.writerow(["fmt", fmt])
+            w.writerow(["index_every", self.index_every])
+            w.writerow(["max_n", self.nmax])
+            w.writerow(["total_bytes", self.offset])
+            w.writerow([])
+            w.writerow(["n", "offset"])
+            for n, off in self.index:
+                w.writerow([n, off])
+
+
+def read_digest(path: str):
+    meta = {}
+    chunks = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        r = csv.reader(f, delimiter="\t")
+        in_chunks = False
+        for rec in r:
+            if not rec:
+                continue
+            if rec[0] == "chunk":
+                in_chunks = True
+                continue
+            if rec[0] == "metric":
+                continue
+            if in_chunks:
+                k, n_lo, n_hi, start, end, h = rec
+                chunks.append((int(k), int(n_lo), int(n_hi), int(start), int(end), h))
+            else:
+                meta[rec[0]] = rec[1]
+    return meta, chunks
+
+
+def hash_byte_range(path: str, start: int, end: int, block: int = 1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        left = end - start
+        while left > 0:
+            b = f.read(min(block, left))
+            if not b:
+                break
+            h.update(b)
+            left -= len(b)
+    return h.hexdigest()
+
+
+def verify_digest(args):
+    rows_path = args.out
+    digest_path = args.digest_out or (rows_path + ".digest")
+    meta, chunks = read_digest(digest_path)
+
+    print("STRUCTURAL PRIMALITY VERIFY")
+    print(f"rows = {rows_path}")
+    print(f"digest = {digest_path}")
+
+    problems = []
+
+    leaves = [meta["header_sha256"]] + [c[5] for c in chunks]
+    if merkle_root(leaves) != meta["merkle_root"]:
+        problems.append("digest merkle_root does not match its chunk hashes")
+
+    size = os.path.getsize(rows_path)
+    if size != int(meta["total_bytes"]):
+        problems.append(f"size mismatch: file={size} digest={meta['total_bytes']}")
+
+    if hash_byte_range(rows_path, 0, int(meta["header_bytes"])) != meta["header_sha256"]:
+        problems.append("header mismatch")
+
+    todo = chunks
+    if args.verify_sample > 0 and args.verify_sample < len(chunks):
+        rng = random.Random(args.verify_seed)
+        todo = sorted(rng.sample(chunks, args.verify_sample))
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        got = list(ex.map(lambda c: hash_byte_range(rows_path, c[3], c[4]), todo))
+
+    bad = 0
+    for c, h in zip(todo, got):
+        if h != c[5]:
+            bad += 1
+            problems.append(f"chunk {c[0]}: n in [{c[1]}, {c[2]}] bytes [{c[3]}, {c[4]})")
+
+    print(f"chunks_total = {len(chunks)}")
+    print(f"chunks_checked = {len(todo)}")
+    print(f"chunks_mismatched = {bad}")
+    for line in problems:
+        print(f"MISMATCH {line}")
+    print(f"verified = {int(not problems)}")
+    return not problems
+
+
+ROW_FIELDS = [
+    "n",
+    "status",
+    "closure_d",
+    "closure_r",
+    "closure_a",
+    "closure_band",
+    "closest_d",
+    "closest_r",
+    "closest_gap",
+    "closest_g",
+    "closest_a",
+    "closest_band",
+    "S_min",
+    "S_avg",
+    "S_energy",
+    "hardness",
+    "notes",
+]
+
+
+def prime_row(n: int, sig_primes, sig_div_cap: int, kernel, full_closest: bool, hardness_invert: bool):
+    limit_d = int(math.isqrt(n))
+    sig = signature_for_n(n, sig_primes, min(limit_d, sig_div_cap), kernel)
+    closest = sig
+    if full_closest:
+        closest = closest_full_for_n(n, limit_d)
+    hardness = compute_hardness_q(closest["closest_a_q"], sig["S_energy_q"], hardness_invert)
+    return [
+        n,
+        "STRUCTURAL_PRIME",
+        "",
+        "",
+        "",
+        "",
+        closest["closest_d"],
+        closest["closest_r"],
+        closest["closest_gap"],
+        closest["closest_g"],
+        closest["closest_a"],
+        closest["closest_band"],
+        sig["S_min"],
+        sig["S_avg"],
+        sig["S_energy"],
+        hardness,
+        "no closure up to floor(sqrt(n))",
     ]
 
-    w = csv.writer(fp, delimiter=delim)
-    w.writerow(fields)
 
+def iter_rows(args, sig_div_cap: int, nmax: int):
     sig_primes = generate_sig_primes(sig_div_cap)
+    kernel = signature_kernel(sig_primes)
     spf = sieve_spf(nmax) if args.engine == "spf" else None
+    tp_setup = trial_prime_setup(nmax) if args.engine == "trial_prime" else None
+    tp_hi = 0
+    tp_block = {}
 
     rows_written = 0
 
@@ -214,41 +635,15 @@ def write_rows(args, sig_div_cap: int):
 
         if n in (2, 3):
             row = [n, "STRUCTURAL_PRIME"] + [""] * 14 + ["", "base prime"]
-            w.writerow(row)
             rows_written += 1
+            yield row
             continue
 
         if args.engine == "spf":
             if spf[n] == n:
-                limit_d = int(math.isqrt(n))
-                sig = signature_for_n(n, sig_primes, min(limit_d, sig_div_cap))
-                closest = sig
-                if args.full_closest:
-                    closest = closest_full_for_n(n, limit_d)
-                hardness = compute_hardness(closest["closest_a"], sig["S_energy"])
-                if hardness != "" and args.hardness_invert:
-                    hardness = 1.0 - hardness
-                row = [
-                    n,
-                    "STRUCTURAL_PRIME",
-                    "",
-                    "",
-                    "",
-                    "",
-                    closest["closest_d"],
-                    closest["closest_r"],
-                    closest["closest_gap"],
-                    closest["closest_g"],
-                    closest["closest_a"],
-                    closest["closest_band"],
-                    sig["S_min"],
-                    sig["S_avg"],
-                    sig["S_energy"],
-                    hardness,
-                    "no closure up to floor(sqrt(n))",
-                ]
-                w.writerow(row)
+                row = prime_row(n, sig_primes, sig_div_cap, kernel, args.full_closest, args.hardness_invert)
                 rows_written += 1
+                yield row
             else:
                 d = spf[n]
                 row = [
@@ -270,8 +665,8 @@ def write_rows(args, sig_div_cap: int):
                     "",
                     "closure witness (spf)",
                 ]
-                w.writerow(row)
                 rows_written += 1
+                yield row
         else:
             if n % 2 == 0:
                 row = [
@@ -293,16 +688,23 @@ def write_rows(args, sig_div_cap: int):
                     "",
                     "even closure",
                 ]
-                w.writerow(row)
                 rows_written += 1
+                yield row
                 continue
 
             limit_d = int(math.isqrt(n))
             closure_d = 0
-            for d in range(3, limit_d + 1, 2):
-                if n % d == 0:
-                    closure_d = d
-                    break
+            if tp_setup is not None:
+                if n > tp_hi:
+                    tp_hi = min(nmax, n + 2 * (TRIAL_BLOCK - 1))
+                    ns = [m for m in range(n, tp_hi + 1, 2) if args.sample_every <= 1 or m % args.sample_every == 0]
+                    tp_block = trial_prime_witnesses(ns, tp_setup)
+                closure_d = tp_block[n]
+            else:
+                for d in range(3, limit_d + 1, 2):
+                    if n % d == 0:
+                        closure_d = d
+                        break
 
             if closure_d:
                 row = [
@@ -324,69 +726,470 @@ def write_rows(args, sig_div_cap: int):
                     "",
                     "closure witness (trial)",
                 ]
-                w.writerow(row)
                 rows_written += 1
+                yield row
             else:
-                sig = signature_for_n(n, sig_primes, min(limit_d, sig_div_cap))
-                closest = sig
-                if args.full_closest:
-                    closest = closest_full_for_n(n, limit_d)
-                hardness = compute_hardness(closest["closest_a"], sig["S_energy"])
-                if hardness != "" and args.hardness_invert:
-                    hardness = 1.0 - hardness
-                row = [
-                    n,
-                    "STRUCTURAL_PRIME",
-                    "",
-                    "",
-                    "",
-                    "",
-                    closest["closest_d"],
-                    closest["closest_r"],
-                    closest["closest_gap"],
-                    closest["closest_g"],
-                    closest["closest_a"],
-                    closest["closest_band"],
-                    sig["S_min"],
-                    sig["S_avg"],
-                    sig["S_energy"],
-                    hardness,
-                    "no closure up to floor(sqrt(n))",
-                ]
-                w.writerow(row)
+                row = prime_row(n, sig_primes, sig_div_cap, kernel, args.full_closest, args.hardness_invert)
                 rows_written += 1
+                yield row
 
+
+ROW_BATCH = 4096
+
+
+def drain_rows(q, w, stream, errors):
+    # Writer stage of write_rows: batches arrive in order on a bounded queue,
+    # so the compute side only waits when the writer falls a full queue behind.
+    try:
+        while True:
+            batch = q.get()
+            if batch is None:
+                return
+            for row in batch:
+                stream.begin_n(row[0])
+                w.writerow(row)
+    except BaseException as e:
+        errors.append(e)
+        while q.get() is not None:
+            pass
+
+
+def write_rows(args, sig_div_cap: int):
+    nmax = max(2, args.max_n)
+    fmt = args.fmt.lower().strip()
+    delim = "\t" if fmt == "tsv" else ","
+
+    out_fp = None
+    if args.out:
+        out_fp = open(args.out, "w", newline="", encoding="utf-8")
+        fp = out_fp
+    else:
+        fp = sys.stdout
+
+    digest_chunk = args.digest_chunk if args.digest else 0
+    stream = RowStream(fp, nmax, digest_chunk, args.index_every)
+    w = csv.writer(stream, delimiter=delim)
+    w.writerow(ROW_FIELDS)
+
+    rows_written = 0
+    q = queue.Queue(maxsize=max(1, args.queue_depth))
+    errors = []
+    t = threading.Thread(target=drain_rows, args=(q, w, stream, errors), daemon=True)
+    t.start()
+    try:
+        batch = []
+        for row in iter_rows(args, sig_div_cap, nmax):
+            batch.append(row)
+            if len(batch) >= ROW_BATCH:
+                rows_written += len(batch)
+                q.put(batch)
+                batch = []
+                if errors:
+                    break
+        if batch and not errors:
+            rows_written += len(batch)
+            q.put(batch)
+    finally:
+        q.put(None)
+        t.join()
+    if errors:
+        raise errors[0]
+
+    stream.finish()
     if out_fp:
         out_fp.close()
 
+    if args.digest:
+        stream.write_digest(args.digest_out or (args.out + ".digest"))
+    if args.index_every > 0:
+        stream.write_index(args.index_out or (args.out + ".idx"), fmt)
+
     return rows_written
 
 
-def write_summary(args, sig_div_cap: int):
+PREFIX_BANDS = ["A", "B", "C", "D", "E", "F"]
+PREFIX_HBINS = 10
+PREFIX_FIELDS = ["primes"] + PREFIX_BANDS + [f"h{i}" for i in range(PREFIX_HBINS)]
+
+
+def segment_primes(lo: int, hi: int, base_primes=None):
+    lo = max(lo, 2)
+    if hi < lo:
+        return []
+    if base_primes is None:
+        base_primes = generate_sig_primes(int(math.isqrt(hi)))
+    flags = bytearray([1]) * (hi - lo + 1)
+    for p in base_primes:
+        if p * p > hi:
+            break
+        start = max(p * p, ((lo + p - 1) // p) * p)
+        flags[start - lo::p] = bytes(len(range(start - lo, hi - lo + 1, p)))
+    return [lo + i for i, f in enumerate(flags) if f]
+
+
+def prefix_add(vec, band, hardness):
+    vec[0] += 1
+    if band in PREFIX_BANDS:
+        vec[1 + PREFIX_BANDS.index(band)] += 1
+    if hardness != "":
+        vec[1 + len(PREFIX_BANDS) + min(PREFIX_HBINS - 1, int(hardness * PREFIX_HBINS))] += 1
+
+
+def prime_profile(n: int, sig_primes, sig_div_cap: int, kernel, full_closest: bool, hardness_invert: bool):
+    if n in (2, 3):
+        return "", ""
+    row = prime_row(n, sig_primes, sig_div_cap, kernel, full_closest, hardness_invert)
+    return row[11], row[15]
+
+
+def write_prefix_index(path: str, meta, ns, vecs):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter="\t")
+        w.writerow(["metric", "value"])
+        for k, v in meta:
+            w.writerow([k, v])
+        w.writerow([])
+        w.writerow(["n"] + PREFIX_FIELDS)
+        for n, vec in zip(ns, vecs):
+            w.writerow([n] + vec)
+
+
+def load_prefix_index(path: str):
+    meta = {}
+    ns = []
+    vecs = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        in_rows = False
+        for rec in csv.reader(f, delimiter="\t"):
+            if not rec or rec[0] == "metric":
+                continue
+            if rec[0] == "n":
+                in_rows = True
+                continue
+            if in_rows:
+                ns.append(int(rec[0]))
+                vecs.append([int(x) for x in rec[1:]])
+            else:
+                meta[rec[0]] = rec[1]
+    sig_div_cap = int(meta["sig_div_cap"])
+    sig_primes = generate_sig_primes(sig_div_cap)
+    return {
+        "meta": meta,
+        "max_n": int(meta["max_n"]),
+        "ns": ns,
+        "vecs": vecs,
+        "sig_div_cap": sig_div_cap,
+        "sig_primes": sig_primes,
+        "kernel": signature_kernel(sig_primes),
+        "base_primes": generate_sig_primes(int(math.isqrt(int(meta["max_n"])))),
+        "full_closest": meta.get("full_closest") == "1",
+        "hardness_invert": meta.get("hardness_invert") == "1",
+    }
+
+
+def prefix_scan(index, lo: int, hi: int):
+    vec = [0] * len(PREFIX_FIELDS)
+    for n in segment_primes(lo, hi, index["base_primes"]):
+        band, h = prime_profile(
+            n,
+            index["sig_primes"],
+            index["sig_div_cap"],
+            index["kernel"],
+            index["full_closest"],
+            index["hardness_invert"],
+        )
+        prefix_add(vec, band, h)
+    return vec
+
+
+def prefix_count(index, x: int):
+    # Cumulative counts over 2 <= n <= x: nearest checkpoint plus an exact
+    # scan of the gap between it and x (from either side).
+    if x < 2:
+        return [0] * len(PREFIX_FIELDS)
+    if x > index["max_n"]:
+        raise ValueError(f"n={x} is beyond the index max_n={index['max_n']}")
+    ns = index["ns"]
+    vecs = index["vecs"]
+    i = bisect.bisect_right(ns, x) - 1
+    if ns[i] == x:
+        return list(vecs[i])
+    if x - ns[i] <= ns[i + 1] - x:
+        edge = prefix_scan(index, ns[i] + 1, x)
+        return [a + b for a, b in zip(vecs[i], edge)]
+    edge = prefix_scan(index, x + 1, ns[i + 1])
+    return [a - b for a, b in zip(vecs[i + 1], edge)]
+
+
+def prefix_prime_count(index, x: int):
+    # primes-only twin of prefix_count: the edge scan is a bare segmented sieve
+    if x < 2:
+        return 0
+    if x > index["max_n"]:
+        raise ValueError(f"n={x} is beyond the index max_n={index['max_n']}")
+    ns = index["ns"]
+    vecs = index["vecs"]
+    i = bisect.bisect_right(ns, x) - 1
+    if ns[i] == x:
+        return vecs[i][0]
+    if x - ns[i] <= ns[i + 1] - x:
+        return vecs[i][0] + len(segment_primes(ns[i] + 1, x, index["base_primes"]))
+    return vecs[i + 1][0] - len(segment_primes(x + 1, ns[i + 1], index["base_primes"]))
+
+
+def prefix_range_primes(index, a: int, b: int):
+    if b < a:
+        return 0
+    return prefix_prime_count(index, b) - prefix_prime_count(index, a - 1)
+
+
+def prefix_range_counts(index, a: int, b: int):
+    if b < a:
+        return dict.fromkeys(PREFIX_FIELDS, 0)
+    hi = prefix_count(index, b)
+    lo = prefix_count(index, a - 1)
+    return dict(zip(PREFIX_FIELDS, [x - y for x, y in zip(hi, lo)]))
+
+
+def parse_range(text: str):
+    parts = text.split(":")
+    if len(parts) != 2:
+        raise ValueError(f"range {text!r} is not of the form a:b")
+    try:
+        a, b = int(parts[0]), int(parts[1])
+    except ValueError:
+        raise ValueError(f"range {text!r} is not of the form a:b")
+    if a > b:
+        raise ValueError(f"range {text!r} has a > b")
+    return a, b
+
+
+def write_prefix_queries(args, index, ranges):
+
+    out_fp = None
+    if args.summary_out:
+        out_fp = open(args.summary_out, "w", newline="", encoding="utf-8")
+        fp = out_fp
+    else:
+        fp = sys.stdout
+
+    w = csv.writer(fp, delimiter="\t")
+    w.writerow(["a", "b"] + PREFIX_FIELDS)
+    for a, b in ranges:
+        c = prefix_range_counts(index, a, b)
+        w.writerow([a, b] + [c[k] for k in PREFIX_FIELDS])
+
+    if out_fp:
+        out_fp.close()
+
+
+def parse_sweep(text: str):
+    caps = []
+    for part in text.split(","):
+        part = part.strip()
+        if part:
+            caps.append(int(part))
+    return sorted(set(caps))
+
+
+def band_residues(d: int, bands):
+    out = []
+    for r in range(1, d):
+        gap = r if r <= (d - r) else (d - r)
+        if band_from_q(d - 2 * gap, d) in bands:
+            out.append(r)
+    return out
+
+
+def band_progressions(d: int, bands):
+    # Odd n coprime to d that sit in one of `bands` against d, as residue
+    # classes mod M = 2 * d (mod 2 for d = 2). Being in the band against d is
+    # necessary for closest_d == d with that closest_band.
+    ok = band_residues(d, bands)
+    if d == 2:
+        return 2, ([1] if 1 in ok else [])
+    M = 2 * d
+    return M, sorted(r if r % 2 == 1 else r + d for r in ok)
+
+
+def progression_primes(c: int, M: int, lo: int, hi: int, sieve_invs):
+    # Primes n = c + k*M in [lo, hi], sieving the progression itself;
+    # sieve_invs holds (q, M^-1 mod q) for every base prime q not dividing M.
+    k0 = (lo - c + M - 1) // M if lo > c else 0
+    k1 = (hi - c) // M
+    if k1 < k0:
+        return []
+    size = k1 - k0 + 1
+    flags = bytearray([1]) * size
+    first = c + k0 * M
+    for q, inv in sieve_invs:
+        if q * q > hi:
+            break
+        # c + k*M == 0 (mod q), starting no lower than q*q
+        start_n = first + ((-first * inv) % q) * M
+        if start_n < q * q:
+            start_n += ((q * q - start_n + q * M - 1) // (q * M)) * q * M
+        j = (start_n - first) // M
+        if j < size:
+            flags[j::q] = bytes(len(range(j, size, q)))
+    out = []
+    for j in range(size):
+        if flags[j]:
+            n = first + j * M
+            if n >= 2:
+                out.append(n)
+    return out
+
+
+BAND_SEGMENT = 1 << 20
+
+
+def band_query_rows(a: int, b: int, bands, ds, sig_div_cap: int, full_closest: bool, hardness_invert: bool):
+    sig_primes = generate_sig_primes(sig_div_cap)
+    kernel = signature_kernel(sig_primes)
+    base_primes = generate_sig_primes(int(math.isqrt(max(b, 0))))
+    targets = set(ds)
+    lo = max(a, 4)
+    window = b - lo + 1
+
+    candidates = set()
+
+    # Each d is handled on its own and the matches are unioned, so the work
+    # follows the size of each d's classes. A d whose progressions would be
+    # shorter than the list of sieving primes is served by one shared
+    # segmented sieve instead.
+    scan = {}
+    for d in sorted(targets):
+        M, classes = band_progressions(d, bands)
+        if not classes or window <= 0:
+            continue
+        if window // M < len(base_primes):
+            scan[d] = set(classes)
+            continue
+        sieve_invs = [(q, pow(M, -1, q)) for q in base_primes if M % q != 0]
+        for c in classes:
+            candidates.update(progression_primes(c, M, lo, b, sieve_invs))
+
+    if scan:
+        for seg_lo in range(lo, b + 1, BAND_SEGMENT):
+            seg_hi = min(b, seg_lo + BAND_SEGMENT - 1)
+            for n in segment_primes(seg_lo, seg_hi, base_primes):
+                for d, classes in scan.items():
+                    if n % (2 * d if d != 2 else 2) in classes:
+                        candidates.add(n)
+                        break
+
+    found = []
+    for n in sorted(candidates):
+        row = prime_row(n, sig_primes, sig_div_cap, kernel, full_closest, hardness_invert)
+        if row[6] in targets and row[11] in bands:
+            found.append(row)
+    return found
+
+
+def write_band_query(args, sig_div_cap: int, ranges):
+    fmt = args.fmt.lower().strip()
+    delim = "\t" if fmt == "tsv" else ","
+    bands = set(args.band.upper())
+    ds = parse_sweep(args.band_d)
+
+    out_fp = None
+    if args.out:
+        out_fp = open(args.out, "w", newline="", encoding="utf-8")
+        fp = out_fp
+    else:
+        fp = sys.stdout
+
+    w = csv.writer(fp, delimiter=delim)
+    w.writerow(ROW_FIELDS)
+    matches = 0
+    for a, b in ranges:
+        for row in band_query_rows(a, b, bands, ds, sig_div_cap, args.full_closest, args.hardness_invert):
+            w.writerow(row)
+            matches += 1
+
+    if out_fp:
+        out_fp.close()
+
+    return matches
+
+
+def write_summary(args, sig_div_cap: int, sweep_caps=None):
     nmax = max(2, args.max_n)
     spf = sieve_spf(nmax)
-    sig_primes = generate_sig_primes(sig_div_cap)
+
+    caps = sorted(set([sig_div_cap] + list(sweep_caps or [])))
+    sig_primes = generate_sig_primes(caps[-1])
+    kernel = signature_kernel(sig_primes)
+    base_i = caps.index(sig_div_cap)
 
     prime_count = 0
     composite_count = 0
-    band_counts = {"A": 0, "B": 0, "C": 0, "D": 0, "E": 0, "F": 0}
+    band_counts = [{"A": 0, "B": 0, "C": 0, "D": 0, "E": 0, "F": 0} for _ in caps]
+    s_avg_sum = [0.0 for _ in caps]
+    s_energy_sum = [0.0 for _ in caps]
+    hardness_sum = [0.0 for _ in caps]
+    signed = 0
+
+    stride = args.prefix_stride if args.prefix_index_out else 0
+    prefix_ns = []
+    prefix_vecs = []
+    prefix_vec = [0] * len(PREFIX_FIELDS)
+    if stride:
+        for m in (0, 1):
+            if m % stride == 0:
+                prefix_ns.append(m)
+                prefix_vecs.append(list(prefix_vec))
 
     for n in range(2, nmax + 1):
+        if stride and (n % stride == 0 or n == nmax):
+            prefix_ns.append(n)
         if n in (2, 3):
             prime_count += 1
+            if stride:
+                prefix_add(prefix_vec, "", "")
+                if prefix_ns[-1] == n:
+                    prefix_vecs.append(list(prefix_vec))
             continue
         if spf[n] == n:
             prime_count += 1
             limit_d = int(math.isqrt(n))
-            sig = signature_for_n(n, sig_primes, min(limit_d, sig_div_cap))
-            closest = sig
-            if args.full_closest:
-                closest = closest_full_for_n(n, limit_d)
-            b = closest["closest_band"]
-            if b in band_counts:
-                band_counts[b] += 1
+            if sweep_caps:
+                sigs = signature_sweep_for_n(n, sig_primes, [min(limit_d, c) for c in caps], kernel)
+            else:
+                sigs = [signature_for_n(n, sig_primes, min(limit_d, sig_div_cap), kernel)]
+            full = closest_full_for_n(n, limit_d) if args.full_closest else None
+            signed += 1
+            for i, sig in enumerate(sigs):
+                closest = full or sig
+                b = closest["closest_band"]
+                if b in band_counts[i]:
+                    band_counts[i][b] += 1
+                if not (sweep_caps or stride):
+                    continue
+                h = compute_hardness_q(closest["closest_a_q"], sig["S_energy_q"], args.hardness_invert)
+                if sweep_caps:
+                    if sig["S_avg"] != "":
+                        s_avg_sum[i] += sig["S_avg"]
+                        s_energy_sum[i] += sig["S_energy"]
+                    if h != "":
+                        hardness_sum[i] += h
+                if stride and i == base_i:
+                    prefix_add(prefix_vec, closest["closest_band"], h)
         else:
             composite_count += 1
+        if stride and prefix_ns[-1] == n:
+            prefix_vecs.append(list(prefix_vec))
+
+    if stride:
+        meta = [
+            ("prefix_stride", stride),
+            ("max_n", nmax),
+            ("sig_div_cap", sig_div_cap),
+            ("full_closest", int(args.full_closest)),
+            ("hardness_invert", int(args.hardness_invert)),
+        ]
+        write_prefix_index(args.prefix_index_out, meta, prefix_ns, prefix_vecs)
 
     out_fp = None
     if args.summary_out:
@@ -402,7 +1205,20 @@ def write_summary(args, sig_div_cap: int):
     w.writerow([])
     w.writerow(["closest_band_distribution", "count"])
     for k in ["A", "B", "C", "D", "E", "F"]:
-        w.writerow([k, band_counts[k]])
+        w.writerow([k, band_counts[base_i][k]])
+
+    if sweep_caps:
+        for i, cap in enumerate(caps):
+            if cap not in sweep_caps:
+                continue
+            w.writerow([])
+            w.writerow(["sig_div_cap", cap])
+            w.writerow(["closest_band_distribution", "count"])
+            for k in ["A", "B", "C", "D", "E", "F"]:
+                w.writerow([k, band_counts[i][k]])
+            w.writerow(["S_avg_mean", (s_avg_sum[i] / signed) if signed else ""])
+            w.writerow(["S_energy_mean", (s_energy_sum[i] / signed) if signed else ""])
+            w.writerow(["hardness_mean", (hardness_sum[i] / signed) if signed else ""])
 
     if out_fp:
         out_fp.close()
@@ -411,8 +1227,8 @@ def write_summary(args, sig_div_cap: int):
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--max_n", type=int, default=50)
-    ap.add_argument("--engine", type=str, default="spf", choices=["spf", "trial"])
-    ap.add_argument("--mode", type=str, default="rows", choices=["rows", "summary", "both"])
+    ap.add_argument("--engine", type=str, default="spf", choices=["spf", "trial", "trial_prime"])
+    ap.add_argument("--mode", type=str, default="rows", choices=["rows", "summary", "both", "verify", "query", "band_query"])
     ap.add_argument("--out", type=str, default="")
     ap.add_argument("--summary_out", type=str, default="")
     ap.add_argument("--fmt", type=str, default="csv", choices=["csv", "tsv"])
@@ -422,25 +1238,136 @@ def main():
 
     ap.add_argument("--sig_div_mode", type=str, default="fixed", choices=["fixed", "adaptive"])
     ap.add_argument("--sig_div_max", type=int, default=101)
+    ap.add_argument("--sig_div_sweep", type=str, default="", help="comma-separated caps summarized in one pass, e.g. 23,47,101,211")
 
     ap.add_argument("--sample_every", type=int, default=1)
     ap.add_argument("--max_rows", type=int, default=0)
 
+    ap.add_argument("--digest", action="store_true")
+    ap.add_argument("--digest_chunk", type=int, default=1000000)
+    ap.add_argument("--digest_out", type=str, default="")
+    ap.add_argument("--verify_sample", type=int, default=0)
+    ap.add_argument("--verify_seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=0)
+
+    ap.add_argument("--queue_depth", type=int, default=8)
+
+    ap.add_argument("--index_every", type=int, default=0)
+    ap.add_argument("--index_out", type=str, default="")
+
+    ap.add_argument("--prefix_index_out", type=str, default="")
+    ap.add_argument("--prefix_stride", type=int, default=10000)
+    ap.add_argument("--prefix_index", type=str, default="")
+    ap.add_argument("--query", type=str, action="append", default=[], help="range a:b for --mode query / band_query (repeatable)")
+
+    ap.add_argument("--band", type=str, default="A", help="closest_band letters to match in --mode band_query, e.g. A or AB")
+    ap.add_argument("--band_d", type=str, default="", help="comma-separated closest_d values to match in --mode band_query")
+
     args = ap.parse_args()
 
+    # Byte offsets only hold for a rows file of its own; on stdout the run
+    # banner shares the stream.
+    if args.digest and not args.out:
+        ap.error("--digest needs --out")
+    if args.index_every > 0 and not args.out:
+        ap.error("--index_every needs --out")
+    if args.digest and args.digest_chunk < 1:
+        ap.error("--digest_chunk must be >= 1")
+
+    if args.prefix_index_out and args.prefix_stride < 1:
+        ap.error("--prefix_stride must be >= 1")
+    if args.sig_div_sweep and args.mode not in ("summary", "both"):
+        ap.error("--sig_div_sweep only applies to --mode summary or both")
+    if args.prefix_index_out and args.mode not in ("summary", "both"):
+        ap.error("--prefix_index_out is built by --mode summary or both")
+
+    if args.mode == "query":
+        if not args.prefix_index or not args.query:
+            ap.error("--mode query needs --prefix_index and at least one --query a:b")
+        index = load_prefix_index(args.prefix_index)
+        ranges = []
+        for q in args.query:
+            try:
+                a, b = parse_range(q)
+            except ValueError as e:
+                ap.error(f"--query: {e}")
+            if b > index["max_n"]:
+                ap.error(f"--query {q} goes beyond the index max_n = {index['max_n']}")
+            ranges.append((a, b))
+        write_prefix_queries(args, index, ranges)
+        return
+
+    if args.mode == "verify":
+        if not args.out:
+            ap.error("--mode verify needs --out (the rows file to check)")
+        if not os.path.isfile(args.out):
+            ap.error(f"rows file {args.out} not found")
+        digest_path = args.digest_out or (args.out + ".digest")
+        if not os.path.isfile(digest_path):
+            ap.error(f"digest sidecar {digest_path} not found (write it with --digest)")
+        ok = verify_digest(args)
+        sys.exit(0 if ok else 1)
+
     nmax = max(2, args.max_n)
+    if args.mode == "band_query":
+        if not args.query or not args.band_d:
+            ap.error("--mode band_query needs --band_d and at least one --query a:b")
+        if not args.band or not set(args.band.upper()) <= set("ABCDEF"):
+            ap.error(f"--band {args.band!r} must be one or more of the letters A-F")
+        band_ranges = []
+        for q in args.query:
+            try:
+                band_ranges.append(parse_range(q))
+            except ValueError as e:
+                ap.error(f"--query: {e}")
+        nmax = max(2, max(b for _, b in band_ranges))
     if args.sig_div_mode == "adaptive":
         sig_div_cap = min(args.sig_div_max, int(math.isqrt(nmax)))
     else:
         sig_div_cap = args.sig_div_max
 
+    if args.mode == "band_query":
+        try:
+            band_ds = parse_sweep(args.band_d)
+        except ValueError:
+            ap.error(f"--band_d {args.band_d!r} is not a comma-separated list of primes")
+        for d in band_ds:
+            if not segment_primes(d, d):
+                ap.error(f"--band_d {d} is not prime")
+            if d > sig_div_cap and not args.full_closest:
+                ap.error(f"--band_d {d} is above sig_div_cap = {sig_div_cap} (use --full_closest for larger d)")
+
+    sweep_caps = []
+    if args.sig_div_sweep:
+        try:
+            sweep_caps = parse_sweep(args.sig_div_sweep)
+        except ValueError:
+            ap.error(f"--sig_div_sweep {args.sig_div_sweep!r} is not a comma-separated list of caps")
+        if sweep_caps and sweep_caps[0] < 2:
+            ap.error(f"--sig_div_sweep cap {sweep_caps[0]} is below 2")
+    if args.sig_div_mode == "adaptive":
+        sweep_caps = sorted(set(min(c, int(math.isqrt(nmax))) for c in sweep_caps))
+
     print("STRUCTURAL PRIMALITY RUN")
     print(f"max_n = {args.max_n}")
     print(f"engine = {args.engine}")
     print(f"sig_div_mode = {args.sig_div_mode}")
     print(f"sig_div_cap = {sig_div_cap}")
+    if sweep_caps:
+        print(f"sig_div_sweep = {','.join(str(c) for c in sweep_caps)}")
     print(f"full_closest = {int(args.full_closest)}")
     print(f"hardness_invert = {int(args.hardness_invert)}")
+    if args.digest:
+        print(f"digest_chunk = {args.digest_chunk}")
+
+    if args.mode == "band_query":
+        print(f"band = {args.band.upper()}")
+        print(f"band_d = {args.band_d}")
+        matches = write_band_query(args, sig_div_cap, band_ranges)
+        print(f"band_matches = {matches}")
+        if args.out:
+            print(f"rows_out = {args.out}")
+        return
 
     rows_written = 0
     if args.mode in ("rows", "both"):
@@ -450,11 +1377,17 @@ def main():
             print(f"rows_out = {args.out}")
         else:
             print(f"rows_written = {rows_written}")
+        if args.digest:
+            print(f"digest_out = {args.digest_out or (args.out + '.digest')}")
+        if args.index_every > 0:
+            print(f"index_out = {args.index_out or (args.out + '.idx')}")
 
     if args.mode in ("summary", "both"):
-        write_summary(args, sig_div_cap)
+        write_summary(args, sig_div_cap, sweep_caps)
         if args.summary_out:
             print(f"summary_out = {args.summary_out}")
+        if args.prefix_index_out:
+            print(f"prefix_index_out = {args.prefix_index_out}")
 
     if args.engine == "spf":
         spf = sieve_spf(nmax)